@@ -1,14 +1,12 @@
 from calendar import monthrange
-import os, json
-from collections import defaultdict
-from datetime import timedelta, timezone, datetime
+import heapq
+from datetime import timedelta, datetime
 from zoneinfo import ZoneInfo
+from backends import get_storage
+from rollups import get_rollups
 
 app_timezone = ZoneInfo("Europe/Moscow")
 
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-STATS_FOLDER = os.path.join(SCRIPT_DIR, "stats")
-
 def format_playtime(seconds, lang):
     minutes = seconds / 60
     minute = 'm' if lang == 'EN' else 'м'
@@ -32,19 +30,6 @@ def format_playtime(seconds, lang):
             parts.append(f"{minutes}{minute}")
         return " ".join(parts)
 
-def calculate_session_seconds(sessions):
-    total = 0
-    for session in sessions:
-        try:
-            start = datetime.fromisoformat(session['play_start'])
-            end = datetime.fromisoformat(session['play_end'])
-            duration = (end - start).total_seconds()
-            if duration > 0:
-                total += duration
-        except:
-            continue
-    return total
-
 def get_date_range(option: str):
     today = datetime.now(app_timezone)
     if option == "today":
@@ -72,9 +57,7 @@ def get_date_range(option: str):
         raise ValueError("Invalid option. Choose from: today, yesterday, this_week, this_month")
 
 def players_analyzer(period, language="EN"):
-    if not os.path.exists(STATS_FOLDER):
-        print("❌ Stats folder not found.")
-        return
+    storage = get_storage()
     wanted_dates = get_date_range(period)
     minimum_data_files = {
         'today': 1,
@@ -82,58 +65,61 @@ def players_analyzer(period, language="EN"):
         'this_week': 3,
         'this_month': 7,
     }
-    all_files = [
-        f for f in os.listdir(STATS_FOLDER)
-        if f.startswith("players-") and f.endswith((".json", ".jsonl"))
-    ]
-
-    relevant_files = [
-        f for f in all_files
-        if os.path.splitext(f)[0].replace("players-", "") in wanted_dates
-    ]
+    recorded_days = storage.recorded_days()
+    if not recorded_days:
+        print("❌ No stats recorded yet.")
+        return
+
+    wanted_dates = set(wanted_dates)
+    relevant_days = [day for day in recorded_days if day in wanted_dates]
     min_data_required = minimum_data_files.get(period, 1)
-    data_found = len(all_files)
+    data_found = len(recorded_days)
     if not (data_found >= min_data_required): 
         print('[REJECTED]:', 'Found', data_found, 'min was', min_data_required)
         return
 
-    if not relevant_files:
-        print("⚠️ No matching JSON files found in stats folder.")
+    if not relevant_days:
+        print("⚠️ No matching days found in stats.")
         return
-    player_stats = defaultdict(lambda: {
-        "total_seconds": 0,
-        "total_score": 0,
-    })
-    for filename in relevant_files:
-        file_path = os.path.join(STATS_FOLDER, filename)
-
-        with open(file_path, "r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    entry = json.loads(line.strip())
-                    name = entry.get("player_name", "").strip() or 'NoName'
-                    sessions = entry.get("sessions", [])
-
-                    duration = calculate_session_seconds(sessions)
-                    score_sum = sum(
-                        int(s.get("score", 0)) for s in sessions
-                        if s.get("play_start") and s.get("play_end")
-                    )
-                    stats = player_stats[name]
-                    stats["total_seconds"] += duration
-                    stats["total_score"] += score_sum
-                except Exception as e:
-                    print(f"Error reading {filename}: {e}")
-                    continue
-
-    requested_stats = []
-    for name, data in sorted(player_stats.items(), key=lambda x: x[1]["total_seconds"], reverse=True):
-        readable_time = format_playtime(data["total_seconds"], language)
-        player_score = max(0, data['total_score'])
-        requested_stats.append({
-            'name': name,
-            'score': player_score,
-            'gameplay': readable_time
-        })
+    player_stats = get_rollups().period(relevant_days)
+    return PlayerStatsResult(player_stats, language)
+
+
+class PlayerStatsResult:
+    # Players ranked by playtime. Slicing only ranks what the slice needs: early pages come
+    # from a bounded heap, the full sort happens once and only if deep pages are requested.
+    def __init__(self, player_stats, language="EN"):
+        self._items = list(player_stats.items())
+        self._sorted = None
+        self.language = language
 
-    return requested_stats
\ No newline at end of file
+    def __len__(self):
+        return len(self._items)
+
+    def _entry(self, item):
+        name, data = item
+        return {
+            'name': name,
+            'score': max(0, data['total_score']),
+            'gameplay': format_playtime(data["total_seconds"], self.language)
+        }
+
+    def _ranked(self, stop):
+        if self._sorted is None and stop * 4 <= len(self._items):
+            return heapq.nlargest(stop, self._items, key=lambda x: x[1]["total_seconds"])
+        if self._sorted is None:
+            self._sorted = sorted(self._items, key=lambda x: x[1]["total_seconds"], reverse=True)
+        return self._sorted
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._items))
+            return [self._entry(item) for item in self._ranked(stop)[start:stop:step]]
+        if index < 0:
+            index += len(self._items)
+        if not 0 <= index < len(self._items):
+            raise IndexError(index)
+        return self._entry(self._ranked(index + 1)[index])
+
+    def __iter__(self):
+        return iter(self[:])
@@ -0,0 +1,505 @@
+import os, json, sqlite3, argparse
+from collections import defaultdict
+from datetime import datetime, timedelta
+from storage import atomic_write_json, atomic_write_jsonl, file_lock, flush as flush_state
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATS_FOLDER = os.path.join(SCRIPT_DIR, "stats")
+USER_FILE = "users.json"
+SERVER_TIME_FILE = os.path.join(SCRIPT_DIR, "server_time.json")
+SQLITE_FILE = os.environ.get("SQLITE_FILE", os.path.join(SCRIPT_DIR, "tracker.db"))
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "json")
+
+
+def session_seconds(session):
+    try:
+        start = datetime.fromisoformat(session['play_start'])
+        end = datetime.fromisoformat(session['play_end'])
+        return max(0, (end - start).total_seconds())
+    except Exception:
+        return 0
+
+
+def merge_player_records(existing_data, data, now, session_gap):
+    now_iso = now.isoformat()
+    for record in data:
+        name = record['player_name']
+        playtime = record['player_playtime']
+        score = record.get('player_score', 0)
+
+        if name not in existing_data:
+            play_start = (now - timedelta(seconds=playtime)).isoformat()
+            record['timestamp'] = now_iso
+            record['last_seen'] = now_iso
+            record['sessions'] = [{
+                'play_start': play_start,
+                'play_end': now_iso,
+                'score': score
+            }]
+            existing_data[name] = record
+
+        else:
+            saved = existing_data[name]
+            last_seen_str = saved.get('last_seen')
+            last_seen = datetime.fromisoformat(last_seen_str) if last_seen_str else now
+            time_diff = (now - last_seen).total_seconds()
+
+            saved['last_seen'] = now_iso
+
+            if 'sessions' not in saved or not saved['sessions']:
+                play_start = (now - timedelta(seconds=playtime)).isoformat()
+                saved['sessions'] = [{
+                    'play_start': play_start,
+                    'play_end': now_iso,
+                    'score': score
+                }]
+            else:
+                last_session = saved['sessions'][-1]
+                if time_diff <= session_gap:
+                    last_session['play_end'] = now_iso
+                    if score > last_session.get('score', 0):
+                        last_session['score'] = score
+                else:
+                    saved['sessions'].append({
+                        'play_start': now_iso,
+                        'play_end': now_iso,
+                        'score': score
+                    })
+            if playtime > saved.get('player_playtime', 0):
+                saved['player_playtime'] = playtime
+                saved['timestamp'] = now_iso
+            if score > saved.get('player_score', 0):
+                saved['player_score'] = score
+    return existing_data
+
+
+class StorageBackend:
+    def load_users(self):
+        raise NotImplementedError
+
+    def save_users(self, users):
+        raise NotImplementedError
+
+    def save_user(self, user_id, user_data):
+        users = self.load_users()
+        users[user_id] = user_data
+        self.save_users(users)
+
+    def load_alarm_users(self):
+        return {
+            user_id: data for user_id, data in self.load_users().items()
+            if data.get('players_alarm')
+        }
+
+    def load_last_server_time(self):
+        raise NotImplementedError
+
+    def save_server_time(self, now):
+        raise NotImplementedError
+
+    def record_tick(self, data, now, session_gap):
+        raise NotImplementedError
+
+    def load_day(self, day):
+        raise NotImplementedError
+
+    def recorded_days(self):
+        raise NotImplementedError
+
+    def export_warm_state(self, include_day=True):
+        return {}
+
+    def restore_warm_state(self, state):
+        pass
+
+    def player_totals(self, days):
+        totals = defaultdict(lambda: {"total_seconds": 0, "total_score": 0})
+        for day in days:
+            for entry in self.load_day(day).values():
+                name = entry.get("player_name", "").strip() or 'NoName'
+                sessions = entry.get("sessions", [])
+                stats = totals[name]
+                stats["total_seconds"] += sum(session_seconds(s) for s in sessions)
+                stats["total_score"] += sum(
+                    int(s.get("score", 0)) for s in sessions
+                    if s.get("play_start") and s.get("play_end")
+                )
+        return dict(totals)
+
+    def close(self):
+        pass
+
+
+class JsonStorage(StorageBackend):
+    def __init__(self, user_file=USER_FILE, server_time_file=SERVER_TIME_FILE, stats_folder=STATS_FOLDER):
+        self.user_file = user_file
+        self.server_time_file = server_time_file
+        self.stats_folder = stats_folder
+        # In-memory copies keyed by the file's stat signature, so a tick only re-parses a
+        # file when another process has replaced it.
+        self._users = (None, {})
+        self._day = (None, None, {})
+        self._last_server_time = None
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+    def day_path(self, day):
+        return os.path.join(self.stats_folder, f"players-{day}.jsonl")
+
+    def load_users(self):
+        signature = self._signature(self.user_file)
+        if signature is None:
+            return {}
+        if signature != self._users[0]:
+            with open(self.user_file, "r") as f:
+                try:
+                    self._users = (signature, json.load(f))
+                except Exception as e:
+                    print('[WARN]:', 'could not read', self.user_file, e)
+                    return {}
+        return {user_id: dict(data) for user_id, data in self._users[1].items()}
+
+    def _write_users(self, users):
+        atomic_write_json(self.user_file, users, durable=True)
+        self._users = (self._signature(self.user_file), {user_id: dict(data) for user_id, data in users.items()})
+
+    def save_users(self, users):
+        with file_lock(self.user_file):
+            self._write_users(users)
+
+    def save_user(self, user_id, user_data):
+        # The tracker and bot processes both update users.json; the lock keeps one from
+        # overwriting a change the other made between its load and save.
+        with file_lock(self.user_file):
+            users = self.load_users()
+            users[user_id] = user_data
+            self._write_users(users)
+
+    def load_last_server_time(self):
+        if self._last_server_time:
+            return self._last_server_time
+        if os.path.exists(self.server_time_file):
+            try:
+                with open(self.server_time_file, 'r') as f:
+                    data = json.load(f)
+                    return datetime.fromisoformat(data['last_time'])
+            except Exception:
+                pass
+        return None
+
+    def save_server_time(self, now):
+        atomic_write_json(self.server_time_file, {'last_time': now.isoformat()})
+        self._last_server_time = now
+
+    def load_day(self, day):
+        records = {}
+        filepath = self.day_path(day)
+        if not os.path.exists(filepath):
+            return records
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    records[record['player_name']] = record
+                except Exception:
+                    continue
+        return records
+
+    def _current_day(self, day):
+        cached_day, signature, records = self._day
+        if cached_day == day and signature == self._signature(self.day_path(day)):
+            return records
+        return self.load_day(day)
+
+    def record_tick(self, data, now, session_gap):
+        day = now.strftime("%Y-%m-%d")
+        existing_data = merge_player_records(self._current_day(day), data, now, session_gap)
+        try:
+            atomic_write_jsonl(self.day_path(day), existing_data.values())
+            self._day = (day, self._signature(self.day_path(day)), existing_data)
+        except Exception as e:
+            self._day = (None, None, {})
+            print('Error occurred when saving:', e)
+        self.save_server_time(now)
+
+    def export_warm_state(self, include_day=True):
+        day, signature, records = self._day if include_day else (None, None, {})
+        return {
+            'day': day,
+            'day_signature': signature,
+            'day_records': records,
+            'users_signature': self._users[0],
+            'users': self._users[1],
+            'last_server_time': self._last_server_time.isoformat() if self._last_server_time else None,
+            'server_time_signature': self._signature(self.server_time_file),
+        }
+
+    def restore_warm_state(self, state):
+        # Each piece is only trusted if its file is exactly as it was when the state was saved.
+        day = state.get('day')
+        if day and state.get('day_signature') == self._signature(self.day_path(day)):
+            self._day = (day, state['day_signature'], state.get('day_records', {}))
+        if state.get('users_signature') and state['users_signature'] == self._signature(self.user_file):
+            self._users = (state['users_signature'], state.get('users', {}))
+        if state.get('last_server_time') and state.get('server_time_signature') == self._signature(self.server_time_file):
+            self._last_server_time = datetime.fromisoformat(state['last_server_time'])
+
+    def recorded_days(self):
+        if not os.path.exists(self.stats_folder):
+            return []
+        return sorted(
+            os.path.splitext(f)[0].replace("players-", "")
+            for f in os.listdir(self.stats_folder)
+            if f.startswith("players-") and f.endswith((".json", ".jsonl"))
+        )
+
+
+class SQLiteStorage(StorageBackend):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS players (
+            day TEXT NOT NULL,
+            player TEXT NOT NULL,
+            playtime REAL NOT NULL DEFAULT 0,
+            score INTEGER NOT NULL DEFAULT 0,
+            playtime_format TEXT,
+            timestamp TEXT,
+            last_seen TEXT,
+            PRIMARY KEY (day, player)
+        );
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            day TEXT NOT NULL,
+            player TEXT NOT NULL,
+            play_start TEXT NOT NULL,
+            play_end TEXT NOT NULL,
+            score INTEGER NOT NULL DEFAULT 0,
+            seconds REAL NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS sessions_day_player ON sessions (day, player);
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            language TEXT NOT NULL DEFAULT 'EN',
+            players_alarm INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS users_alarm ON users (players_alarm);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, path=SQLITE_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL commits skip the fsync, checkpoints make them durable (sqlite's own group commit).
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    @staticmethod
+    def _user_row(user_id, data):
+        data = data or {}
+        return (user_id, data.get('language', 'EN'), int(data.get('players_alarm') or 0))
+
+    def load_users(self):
+        rows = self.conn.execute("SELECT user_id, language, players_alarm FROM users")
+        return {row['user_id']: {'language': row['language'], 'players_alarm': row['players_alarm']} for row in rows}
+
+    def load_alarm_users(self):
+        rows = self.conn.execute("SELECT user_id, language, players_alarm FROM users WHERE players_alarm > 0")
+        return {row['user_id']: {'language': row['language'], 'players_alarm': row['players_alarm']} for row in rows}
+
+    def save_user(self, user_id, user_data):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO users (user_id, language, players_alarm) VALUES (?, ?, ?)",
+                self._user_row(user_id, user_data)
+            )
+
+    def save_users(self, users):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO users (user_id, language, players_alarm) VALUES (?, ?, ?)",
+                [self._user_row(user_id, data) for user_id, data in users.items()]
+            )
+            known = {row['user_id'] for row in self.conn.execute("SELECT user_id FROM users")}
+            self.conn.executemany("DELETE FROM users WHERE user_id = ?", [(u,) for u in known - set(users)])
+
+    def load_last_server_time(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'last_time'").fetchone()
+        return datetime.fromisoformat(row['value']) if row else None
+
+    def save_server_time(self, now):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_time', ?)", (now.isoformat(),))
+
+    def _load_players(self, day, names=None):
+        if names is None:
+            rows = self.conn.execute("SELECT * FROM players WHERE day = ?", (day,))
+        else:
+            placeholders = ",".join("?" * len(names))
+            rows = self.conn.execute(f"SELECT * FROM players WHERE day = ? AND player IN ({placeholders})", (day, *names))
+        return {
+            row['player']: {
+                'player_name': row['player'],
+                'player_playtime': row['playtime'],
+                'player_score': row['score'],
+                'playtime_format': row['playtime_format'],
+                'timestamp': row['timestamp'],
+                'last_seen': row['last_seen'],
+                'sessions': [],
+            } for row in rows
+        }
+
+    def load_day(self, day):
+        records = self._load_players(day)
+        rows = self.conn.execute(
+            "SELECT player, play_start, play_end, score FROM sessions WHERE day = ? ORDER BY id", (day,)
+        )
+        for row in rows:
+            record = records.get(row['player'])
+            if record is not None:
+                record['sessions'].append({'play_start': row['play_start'], 'play_end': row['play_end'], 'score': row['score']})
+        return records
+
+    def record_tick(self, data, now, session_gap):
+        day = now.strftime("%Y-%m-%d")
+        if not data:
+            self.save_server_time(now)
+            return
+        names = [record['player_name'] for record in data]
+        existing = self._load_players(day, names)
+        # Only the latest session of each player can change during a tick, so load just those.
+        placeholders = ",".join("?" * len(names))
+        rows = self.conn.execute(
+            "SELECT id, player, play_start, play_end, score FROM sessions WHERE id IN ("
+            f"SELECT MAX(id) FROM sessions WHERE day = ? AND player IN ({placeholders}) GROUP BY player)",
+            (day, *names)
+        )
+        for row in rows:
+            record = existing.get(row['player'])
+            if record is not None:
+                record['sessions'] = [{'_id': row['id'], 'play_start': row['play_start'], 'play_end': row['play_end'], 'score': row['score']}]
+        merged = merge_player_records(existing, data, now, session_gap)
+
+        player_rows, updated_sessions, new_sessions = [], [], []
+        for name, record in merged.items():
+            player_rows.append((
+                day, name, record.get('player_playtime', 0), record.get('player_score', 0),
+                record.get('playtime_format'), record.get('timestamp'), record.get('last_seen')
+            ))
+            for session in record['sessions']:
+                values = (session['play_start'], session['play_end'], session.get('score', 0), session_seconds(session))
+                if '_id' in session:
+                    updated_sessions.append((*values, session['_id']))
+                else:
+                    new_sessions.append((day, name, *values))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO players (day, player, playtime, score, playtime_format, timestamp, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", player_rows
+            )
+            self.conn.executemany(
+                "UPDATE sessions SET play_start = ?, play_end = ?, score = ?, seconds = ? WHERE id = ?", updated_sessions
+            )
+            self.conn.executemany(
+                "INSERT INTO sessions (day, player, play_start, play_end, score, seconds) VALUES (?, ?, ?, ?, ?, ?)",
+                new_sessions
+            )
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_time', ?)", (now.isoformat(),))
+
+    def recorded_days(self):
+        return [row['day'] for row in self.conn.execute("SELECT DISTINCT day FROM players ORDER BY day")]
+
+    def player_totals(self, days):
+        days = list(days)
+        if not days:
+            return {}
+        placeholders = ",".join("?" * len(days))
+        rows = self.conn.execute(
+            "SELECT COALESCE(NULLIF(TRIM(player), ''), 'NoName') AS name, "
+            "SUM(seconds) AS total_seconds, SUM(score) AS total_score "
+            f"FROM sessions WHERE day IN ({placeholders}) GROUP BY name",
+            days
+        )
+        return {row['name']: {"total_seconds": row['total_seconds'], "total_score": row['total_score']} for row in rows}
+
+    def import_day(self, day, records):
+        with self.conn:
+            self.conn.execute("DELETE FROM players WHERE day = ?", (day,))
+            self.conn.execute("DELETE FROM sessions WHERE day = ?", (day,))
+            for name, record in records.items():
+                self.conn.execute(
+                    "INSERT INTO players (day, player, playtime, score, playtime_format, timestamp, last_seen) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (day, name, record.get('player_playtime', 0), record.get('player_score', 0),
+                     record.get('playtime_format'), record.get('timestamp'), record.get('last_seen'))
+                )
+                self.conn.executemany(
+                    "INSERT INTO sessions (day, player, play_start, play_end, score, seconds) VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (day, name, s['play_start'], s['play_end'], int(s.get('score', 0)), session_seconds(s))
+                        for s in record.get('sessions', []) if s.get('play_start') and s.get('play_end')
+                    ]
+                )
+
+    def close(self):
+        self.conn.close()
+
+
+_storage = None
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        _storage = SQLiteStorage() if STORAGE_BACKEND == "sqlite" else JsonStorage()
+    return _storage
+
+
+def import_json(source, target):
+    days = source.recorded_days()
+    for day in days:
+        target.import_day(day, source.load_day(day))
+    target.save_users(source.load_users())
+    last_time = source.load_last_server_time()
+    if last_time:
+        target.save_server_time(last_time)
+    print('[IMPORT]:', len(days), 'days imported into', target.path)
+
+
+def export_json(source, target):
+    days = source.recorded_days()
+    for day in days:
+        atomic_write_jsonl(target.day_path(day), source.load_day(day).values())
+    target.save_users(source.load_users())
+    last_time = source.load_last_server_time()
+    if last_time:
+        target.save_server_time(last_time)
+    flush_state()
+    print('[EXPORT]:', len(days), 'days exported to', target.stats_folder)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move tracker history between the JSON files and SQLite.")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("--db", default=SQLITE_FILE)
+    parser.add_argument("--stats", default=STATS_FOLDER)
+    args = parser.parse_args()
+    json_storage = JsonStorage(stats_folder=args.stats)
+    sqlite_storage = SQLiteStorage(args.db)
+    if args.command == "import":
+        import_json(json_storage, sqlite_storage)
+    else:
+        export_json(sqlite_storage, json_storage)
+    sqlite_storage.close()
+
+
+if __name__ == "__main__":
+    main()
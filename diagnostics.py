@@ -0,0 +1,163 @@
+import os, sys, io, time, json, signal, asyncio, argparse, threading, cProfile, pstats, tracemalloc
+from collections import Counter
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DIAGNOSTICS_DIR = os.path.join(SCRIPT_DIR, "profiles")
+ADMIN_IDS = {user_id.strip() for user_id in os.environ.get("ADMIN_IDS", "").split(",") if user_id.strip()}
+MAX_PROFILE_SECONDS = 300
+SAMPLE_INTERVAL = 0.01
+TOP_ENTRIES = 30
+
+_capture_running = False
+
+
+def is_admin(user_id):
+    return str(user_id) in ADMIN_IDS
+
+
+class StackSampler(threading.Thread):
+    # Samples the event loop thread's stack from the side; catches time spent in blocking
+    # calls (socket waits, sleeps, file I/O) that cProfile attributes to a single frame.
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self.total = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < 8:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}")
+                frame = frame.f_back
+            self.samples[" <- ".join(stack)] += 1
+            self.total += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+async def capture_profile(seconds, top=TOP_ENTRIES):
+    global _capture_running
+    if _capture_running:
+        return None
+    _capture_running = True
+    seconds = max(1, min(int(seconds), MAX_PROFILE_SECONDS))
+    started_tracing = not tracemalloc.is_tracing()
+    try:
+        if started_tracing:
+            tracemalloc.start(10)
+        sampler = StackSampler(threading.get_ident())
+        profiler = cProfile.Profile()
+        sampler.start()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+            sampler.stop()
+        memory = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        _capture_running = False
+
+    report = io.StringIO()
+    report.write(f"Profile of pid {os.getpid()} over {seconds}s, captured {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+    report.write(f"=== cProfile, top {top} by cumulative time ===\n")
+    pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(top)
+    report.write(f"\n=== Stack samples every {int(SAMPLE_INTERVAL * 1000)}ms ({sampler.total} samples) ===\n")
+    for stack, count in sampler.samples.most_common(top):
+        report.write(f"{100 * count / max(1, sampler.total):5.1f}%  {stack}\n")
+    report.write(f"\n=== tracemalloc, top {top} allocation sites (traced {current / 1024:.0f} KiB, peak {peak / 1024:.0f} KiB) ===\n")
+    if started_tracing:
+        report.write("(tracemalloc was started for this capture: these are allocations made during the "
+                     "window that were still alive at its end, not the process's total memory)\n")
+    else:
+        report.write("(tracemalloc was already running before this capture)\n")
+    for stat in memory.statistics("lineno")[:top]:
+        report.write(f"{stat}\n")
+    return report.getvalue()
+
+
+def _paths(pid):
+    return (
+        os.path.join(DIAGNOSTICS_DIR, f"{pid}.request"),
+        os.path.join(DIAGNOSTICS_DIR, f"profile-{pid}.txt"),
+    )
+
+
+async def _capture_on_signal():
+    request_path, report_path = _paths(os.getpid())
+    seconds = 30
+    try:
+        with open(request_path, "r") as f:
+            seconds = json.load(f).get("seconds", seconds)
+        os.remove(request_path)
+    except Exception:
+        pass
+    report = await capture_profile(seconds)
+    if report is None:
+        print('[PROFILE]:', 'capture already running, signal ignored')
+        return
+    with open(report_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(report)
+    os.replace(report_path + ".tmp", report_path)
+    print('[PROFILE]:', 'report written to', report_path)
+
+
+def install_signal_handler():
+    # SIGUSR1 starts a capture; nothing is traced until then.
+    if not hasattr(signal, "SIGUSR1"):
+        return
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGUSR1, lambda: loop.create_task(_capture_on_signal()))
+
+
+def request_profile(pid, seconds):
+    # Asks another tracker/bot process for a capture; its report appears at the returned path.
+    os.makedirs(DIAGNOSTICS_DIR, exist_ok=True)
+    request_path, report_path = _paths(pid)
+    if os.path.exists(report_path):
+        os.remove(report_path)
+    with open(request_path, "w") as f:
+        json.dump({"seconds": seconds}, f)
+    os.kill(pid, signal.SIGUSR1)
+    return report_path
+
+
+async def wait_for_report(report_path, seconds):
+    deadline = time.time() + min(seconds, MAX_PROFILE_SECONDS) + 30
+    while time.time() < deadline:
+        if os.path.exists(report_path):
+            with open(report_path, "r", encoding="utf-8") as f:
+                return f.read()
+        await asyncio.sleep(0.5)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile a running tracker/bot process.")
+    parser.add_argument("pid", type=int)
+    parser.add_argument("--seconds", type=int, default=30)
+    args = parser.parse_args()
+
+    report_path = request_profile(args.pid, args.seconds)
+    print('[PROFILE]:', f'capturing {args.seconds}s from pid {args.pid}...')
+    report = asyncio.run(wait_for_report(report_path, args.seconds))
+    if report is None:
+        print('[PROFILE]:', 'no report arrived; is the process running valver.py?')
+        sys.exit(1)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import sys, csv, io, argparse
+from datetime import date, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import backends
+from backends import get_storage, session_seconds
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+SESSION_FIELDS = ["day", "player", "play_start", "play_end", "seconds", "score"]
+DAILY_FIELDS = ["day", "player", "sessions", "total_seconds", "total_score", "first_seen_at", "last_seen"]
+
+
+def iter_days(start, end):
+    recorded = set(get_storage().recorded_days())
+    current = date.fromisoformat(start)
+    last = date.fromisoformat(end)
+    while current <= last:
+        day = current.isoformat()
+        if day in recorded:
+            yield day
+        current += timedelta(days=1)
+
+
+def day_sessions(day):
+    for name, record in get_storage().load_day(day).items():
+        for session in record.get("sessions", []):
+            if not (session.get("play_start") and session.get("play_end")):
+                continue
+            yield {
+                "day": day,
+                "player": name.strip() or "NoName",
+                "play_start": session["play_start"],
+                "play_end": session["play_end"],
+                "seconds": session_seconds(session),
+                "score": int(session.get("score", 0)),
+            }
+
+
+def day_aggregates(day):
+    for name, record in get_storage().load_day(day).items():
+        sessions = [s for s in record.get("sessions", []) if s.get("play_start") and s.get("play_end")]
+        yield {
+            "day": day,
+            "player": name.strip() or "NoName",
+            "sessions": len(sessions),
+            "total_seconds": sum(session_seconds(s) for s in sessions),
+            "total_score": sum(int(s.get("score", 0)) for s in sessions),
+            "first_seen_at": min((s["play_start"] for s in sessions), default=None),
+            "last_seen": record.get("last_seen"),
+        }
+
+
+ROW_SOURCES = {
+    "sessions": (day_sessions, SESSION_FIELDS),
+    "daily": (day_aggregates, DAILY_FIELDS),
+}
+
+
+def iter_rows(kind, start, end):
+    rows_for_day, _ = ROW_SOURCES[kind]
+    for day in iter_days(start, end):
+        yield from rows_for_day(day)
+
+
+def _encode_day(job):
+    kind, day, fmt = job
+    rows_for_day, fields = ROW_SOURCES[kind]
+    if fmt == "parquet":
+        rows = list(rows_for_day(day))
+        return len(rows), pa.Table.from_pylist(rows, schema=_arrow_schema(kind))
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    count = 0
+    for row in rows_for_day(day):
+        writer.writerow(row)
+        count += 1
+    return count, buffer.getvalue()
+
+
+def _worker_storage(storage):
+    # Workers must not share the parent's SQLite connection, so they open their own.
+    if isinstance(storage, backends.SQLiteStorage):
+        return backends.SQLiteStorage, (storage.path,)
+    return _use_storage, (storage,)
+
+
+def _use_storage(storage):
+    return storage
+
+
+def _init_worker(factory, args):
+    backends._storage = factory(*args)
+
+
+def _arrow_schema(kind):
+    if kind == "sessions":
+        return pa.schema([
+            ("day", pa.string()), ("player", pa.string()), ("play_start", pa.string()),
+            ("play_end", pa.string()), ("seconds", pa.float64()), ("score", pa.int64()),
+        ])
+    return pa.schema([
+        ("day", pa.string()), ("player", pa.string()), ("sessions", pa.int64()),
+        ("total_seconds", pa.float64()), ("total_score", pa.int64()),
+        ("first_seen_at", pa.string()), ("last_seen", pa.string()),
+    ])
+
+
+def iter_encoded_days(kind, start, end, fmt, workers=1):
+    # One encoded chunk per day, in day order. With workers only a small window of days is
+    # in flight at once, so memory stays bounded by a few days' worth of rows.
+    jobs = ((kind, day, fmt) for day in iter_days(start, end))
+    if workers <= 1:
+        yield from map(_encode_day, jobs)
+        return
+    window = workers * 2
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=_worker_storage(get_storage())) as pool:
+        pending = []
+        for job in jobs:
+            pending.append(pool.submit(_encode_day, job))
+            if len(pending) >= window:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def export(output, kind="sessions", start=None, end=None, fmt="csv", workers=1):
+    if kind not in ROW_SOURCES:
+        raise ValueError("Invalid kind. Choose from: sessions, daily")
+    days = get_storage().recorded_days()
+    if not days:
+        return 0
+    start = start or days[0]
+    end = end or days[-1]
+
+    if fmt == "parquet":
+        if pa is None:
+            raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+        rows = 0
+        with pq.ParquetWriter(output, _arrow_schema(kind)) as writer:
+            for count, table in iter_encoded_days(kind, start, end, fmt, workers):
+                if count:
+                    writer.write_table(table)
+                    rows += count
+        return rows
+    if fmt != "csv":
+        raise ValueError("Invalid format. Choose from: csv, parquet")
+
+    stream = sys.stdout if output == "-" else open(output, "w", encoding="utf-8", newline="")
+    try:
+        csv.DictWriter(stream, fieldnames=ROW_SOURCES[kind][1]).writeheader()
+        rows = 0
+        for count, chunk in iter_encoded_days(kind, start, end, fmt, workers):
+            stream.write(chunk)
+            rows += count
+        return rows
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export tracked sessions or per-day aggregates.")
+    parser.add_argument("output", help="output file, or - for CSV on stdout")
+    parser.add_argument("--kind", choices=list(ROW_SOURCES), default="sessions")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--from", dest="start", help="first day, YYYY-MM-DD (default: oldest recorded)")
+    parser.add_argument("--to", dest="end", help="last day, YYYY-MM-DD (default: newest recorded)")
+    parser.add_argument("--workers", type=int, default=1, help="encode days in parallel processes")
+    args = parser.parse_args()
+    rows = export(args.output, args.kind, args.start, args.end, args.format, args.workers)
+    print('[EXPORT]:', rows, 'rows written', file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
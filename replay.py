@@ -0,0 +1,159 @@
+import os, json, time, asyncio, argparse, tempfile, contextlib, io
+from datetime import datetime
+
+# When set, every raw A2S reply the tracker receives is appended here for later replay.
+RECORD_FILE = os.environ.get("RECORD_FILE")
+
+
+def record_server_reply(info, players_data):
+    if not RECORD_FILE:
+        return
+    players = dict(players_data)
+    entry = {
+        't': time.time(),
+        'info': dict(info),
+        'players': {**players, 'players': [dict(player) for player in players.get('players', [])]},
+    }
+    try:
+        with open(RECORD_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+    except Exception as e:
+        print('[RECORD]:', 'could not write', RECORD_FILE, e)
+
+
+def load_recording(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except Exception:
+                continue
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+        self.tick_started = None
+
+    async def send_photo(self, chat_id, photo, caption=None, reply_markup=None):
+        self.sent.append({
+            'chat_id': chat_id,
+            'latency': time.perf_counter() - self.tick_started,
+            'bytes': len(photo.getbuffer()),
+        })
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        self.sent.append({'chat_id': chat_id, 'latency': time.perf_counter() - self.tick_started, 'bytes': len(text)})
+
+
+class FakeApp:
+    def __init__(self):
+        self.bot = FakeBot()
+
+
+def _folder_size(folder):
+    total = 0
+    for root, _, files in os.walk(folder):
+        for filename in files:
+            total += os.path.getsize(os.path.join(root, filename))
+    return total
+
+
+def _sqlite_bytes(db_path):
+    return sum(os.path.getsize(p) for p in (db_path, db_path + "-wal") if os.path.exists(p))
+
+
+def seed_users(count):
+    buckets = [2, 5, 9, 10]
+    return {
+        str(1000000 + i): {'language': 'EN' if i % 2 else 'RU', 'players_alarm': buckets[i % len(buckets)]}
+        for i in range(count)
+    }
+
+
+async def run_replay(path, speed=0, backend="json", alarm_users=0, rearm=False, quiet=True):
+    import valver, backends, storage
+
+    workdir = tempfile.mkdtemp(prefix="replay-")
+    storage.JOURNAL_FILE = os.path.join(workdir, "state.journal")
+    storage.enable_journal()
+    if backend == "sqlite":
+        backends._storage = backends.SQLiteStorage(os.path.join(workdir, "tracker.db"))
+    else:
+        backends._storage = backends.JsonStorage(
+            os.path.join(workdir, "users.json"),
+            os.path.join(workdir, "server_time.json"),
+            os.path.join(workdir, "stats"),
+        )
+    users = seed_users(alarm_users)
+    if users:
+        backends._storage.save_users(users)
+
+    snapshots = iter(load_recording(path))
+    current = {}
+
+    def replayed_query():
+        return current['info'], current['players']
+
+    valver.query_server = replayed_query
+    valver.current_time = lambda: datetime.fromtimestamp(current['t'], valver.app_timezone)
+    app = FakeApp()
+    # SQLite writes bypass the storage module, so its state bytes are the growth of the
+    # database and its WAL (the WAL is reused after checkpoints, so this is a lower bound).
+    db_path = getattr(backends._storage, 'path', None)
+    bytes_before = _sqlite_bytes(db_path) if db_path else storage.bytes_written
+    ticks = 0
+    busy_seconds = 0
+    previous_t = None
+    started = time.perf_counter()
+
+    for snapshot in snapshots:
+        if speed and previous_t is not None:
+            await asyncio.sleep(max(0, snapshot['t'] - previous_t) / speed)
+        previous_t = snapshot['t']
+        current.update(snapshot)
+        app.bot.tick_started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            await valver.tracker_tick(app)
+            if rearm and users:
+                backends._storage.save_users(users)
+        busy_seconds += time.perf_counter() - app.bot.tick_started
+        ticks += 1
+
+    storage.flush()
+    elapsed = time.perf_counter() - started
+    latencies = sorted(message['latency'] for message in app.bot.sent)
+    state_bytes = (_sqlite_bytes(db_path) if db_path else storage.bytes_written) - bytes_before
+    backends._storage.close()
+    return {
+        'ticks': ticks,
+        'elapsed_seconds': round(elapsed, 3),
+        'ticks_per_second': round(ticks / busy_seconds, 1) if busy_seconds else 0,
+        'alerts_sent': len(latencies),
+        'alert_latency_p50_ms': round(1000 * latencies[len(latencies) // 2], 2) if latencies else None,
+        'alert_latency_max_ms': round(1000 * latencies[-1], 2) if latencies else None,
+        'state_bytes_written': state_bytes,
+        'workdir_bytes': _folder_size(workdir),
+        'workdir': workdir,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded A2S snapshots through the tracker pipeline.")
+    parser.add_argument("recording", help="JSONL file captured with RECORD_FILE=...")
+    parser.add_argument("--speed", type=float, default=0, help="N for N× real time, 0 to replay as fast as possible")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--alarm-users", type=int, default=0, help="synthetic users with alarms spread over all buckets")
+    parser.add_argument("--rearm", action="store_true", help="re-arm every alarm after each tick")
+    parser.add_argument("--verbose", action="store_true", help="keep the tracker's per-tick output")
+    args = parser.parse_args()
+    report = asyncio.run(run_replay(
+        args.recording, speed=args.speed, backend=args.backend,
+        alarm_users=args.alarm_users, rearm=args.rearm, quiet=not args.verbose,
+    ))
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
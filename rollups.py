@@ -0,0 +1,80 @@
+import os, json
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from backends import get_storage, STATS_FOLDER
+from storage import atomic_write_json
+
+ROLLUP_FILE = os.path.join(STATS_FOLDER, "rollups.json")
+
+
+class DailyRollups:
+    # Per-day {player: [seconds, score]} totals. Closed days never change, so each one is
+    # aggregated once and persisted; only the current day is recomputed on every request.
+    def __init__(self, storage=None, path=ROLLUP_FILE, timezone=ZoneInfo("Europe/Moscow")):
+        self.storage = storage
+        self.path = path
+        self.timezone = timezone
+        self.days = {}
+        self.first_seen = {}
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.days = data.get("days", {})
+            self.first_seen = data.get("first_seen", {})
+        except Exception as e:
+            print('[WARN]:', 'ignoring unreadable rollups', e)
+
+    def _save(self):
+        atomic_write_json(self.path, {"days": self.days, "first_seen": self.first_seen})
+
+    def _storage(self):
+        return self.storage or get_storage()
+
+    def _totals(self, day):
+        totals = self._storage().player_totals([day])
+        return {name: [data["total_seconds"], data["total_score"]] for name, data in totals.items()}
+
+    def today(self):
+        return datetime.now(self.timezone).strftime("%Y-%m-%d")
+
+    def refresh(self):
+        # Roll up every closed day not seen yet, oldest first so first_seen stays correct.
+        self._load()
+        today = self.today()
+        missing = [day for day in self._storage().recorded_days() if day < today and day not in self.days]
+        for day in sorted(missing):
+            self.days[day] = self._totals(day)
+            for name in self.days[day]:
+                if name not in self.first_seen or day < self.first_seen[name]:
+                    self.first_seen[name] = day
+        if missing:
+            self._save()
+
+    def period(self, days):
+        self.refresh()
+        today = self.today()
+        totals = {}
+        for day in days:
+            day_totals = self.days.get(day, {}) if day < today else self._totals(day)
+            for name, (seconds, score) in day_totals.items():
+                entry = totals.setdefault(name, {"total_seconds": 0, "total_score": 0})
+                entry["total_seconds"] += seconds
+                entry["total_score"] += score
+        return totals
+
+
+_rollups = None
+
+def get_rollups():
+    global _rollups
+    if _rollups is None:
+        _rollups = DailyRollups()
+    return _rollups
@@ -0,0 +1,86 @@
+import os, json, mmap, struct, time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_FILE = os.environ.get("SNAPSHOT_FILE", os.path.join(SCRIPT_DIR, "server_snapshot.bin"))
+SNAPSHOT_SIZE = 1024 * 1024
+
+# Layout: [sequence u64][payload length u32][payload]. The writer bumps the sequence to an
+# odd value before touching the payload and to the next even value after, so a reader that
+# sees the same even sequence before and after copying knows it got a consistent snapshot.
+HEADER = struct.Struct("<QI")
+
+
+class SnapshotWriter:
+    def __init__(self, path=SNAPSHOT_FILE, size=SNAPSHOT_SIZE):
+        self.path = path
+        self.size = size
+        with open(path, "a+b") as f:
+            if os.path.getsize(path) < size:
+                f.truncate(size)
+        self._file = open(path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self.sequence = HEADER.unpack_from(self._map, 0)[0]
+        if self.sequence % 2:
+            self.sequence += 1
+
+    def publish(self, data):
+        payload = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+        if len(payload) > self.size - HEADER.size:
+            print('[SNAPSHOT]:', 'payload of', len(payload), 'bytes does not fit, skipped')
+            return
+        struct.pack_into("<Q", self._map, 0, self.sequence + 1)
+        self._map[HEADER.size:HEADER.size + len(payload)] = payload
+        struct.pack_into("<I", self._map, 8, len(payload))
+        self.sequence += 2
+        struct.pack_into("<Q", self._map, 0, self.sequence)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class SnapshotReader:
+    def __init__(self, path=SNAPSHOT_FILE, retries=100):
+        self.path = path
+        self.retries = retries
+        self.sequence = None
+        self.data = None
+        self._file = None
+        self._map = None
+
+    def _open(self):
+        if self._map is not None:
+            return True
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < HEADER.size:
+            return False
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return True
+
+    def read(self):
+        # Readers share the writer's pages; the payload is only copied and parsed when the
+        # sequence has moved since the last read.
+        if not self._open():
+            return None
+        for _ in range(self.retries):
+            sequence, length = HEADER.unpack_from(self._map, 0)
+            if sequence == 0:
+                return None
+            if sequence == self.sequence:
+                return self.data
+            if sequence % 2:
+                time.sleep(0)
+                continue
+            payload = self._map[HEADER.size:HEADER.size + length]
+            if HEADER.unpack_from(self._map, 0)[0] != sequence:
+                continue
+            self.data = json.loads(payload)
+            self.sequence = sequence
+            return self.data
+        return self.data
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = None
@@ -0,0 +1,318 @@
+import os, json, stat, time, tempfile, threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Seconds between group commits. Writes always go through temp + rename, so a crash leaves
+# either the old or the new file, and the directory fsyncs that make the renames survive a
+# power loss are batched into one group commit per interval.
+GROUP_COMMIT_SECONDS = float(os.environ.get("GROUP_COMMIT_SECONDS", 5))
+# Per-tick data is made durable the same way: instead of an fsync per write, the latest
+# payload of each file is appended to the journal once per group commit (a single fsync),
+# and target files are only fsynced every JOURNAL_CHECKPOINT_COMMITS commits, after which
+# the journal is emptied. STATE_JOURNAL=0 falls back to fsyncing every write before its rename.
+# A checkpoint truncates the whole journal, so only the process running the tracker may use
+# it (enable_journal); bot workers and CLI tools fsync their own, much rarer, writes.
+STATE_JOURNAL = os.environ.get("STATE_JOURNAL", "1") == "1"
+JOURNAL_ENABLED = False
+JOURNAL_CHECKPOINT_COMMITS = int(os.environ.get("JOURNAL_CHECKPOINT_COMMITS", 12))
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+JOURNAL_FILE = os.path.join(SCRIPT_DIR, "state.journal")
+TMP_SUFFIX = ".tmp"
+# Temp files younger than this may belong to a writer in another process.
+STALE_TMP_SECONDS = 60
+# Written to a stats folder once every file in it has been checked; until then recovery
+# scans the whole folder instead of only recently modified files.
+FULL_SCAN_MARKER = ".full-scan-done"
+
+_pending_dirs = set()
+_pending_files = set()
+_journal_buffer = {}
+_commits_since_checkpoint = 0
+_last_commit = time.monotonic()
+_lock = threading.Lock()
+bytes_written = 0
+# Read once at import: os.umask can only be read by setting it.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def enable_journal():
+    global JOURNAL_ENABLED
+    JOURNAL_ENABLED = STATE_JOURNAL
+
+
+def _fsync_directory(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _fsync_dir(path):
+    _fsync_directory(os.path.dirname(os.path.abspath(path)))
+
+
+def _fsync_file(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_journal(entries):
+    global bytes_written
+    encoded = "".join(
+        json.dumps({"path": path, "data": payload}, ensure_ascii=False) + "\n"
+        for path, payload in entries.items()
+    ).encode("utf-8")
+    with open(JOURNAL_FILE, "ab") as f:
+        f.write(encoded)
+        f.flush()
+        os.fsync(f.fileno())
+    bytes_written += len(encoded)
+
+
+@contextmanager
+def file_lock(path):
+    # Serialises read-modify-write of a shared file between processes (split deployments).
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.abspath(path) + ".lock", "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def try_lock_file(path):
+    # Returns the open lock file while this process holds it, or None if another process does.
+    f = open(path, "a")
+    if fcntl is None:
+        return f
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+def _replace_with(path, encoded, sync=True):
+    # Each writer gets its own temp name, so processes writing the same file cannot clobber
+    # each other's half-written temp.
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix="." + os.path.basename(path) + ".", suffix=TMP_SUFFIX
+    )
+    try:
+        # mkstemp creates 0600 files; keep the target's mode so other readers of stats/ still can.
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp_path, mode)
+        with os.fdopen(fd, "wb") as f:
+            f.write(encoded)
+            f.flush()
+            if sync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_write_text(path, text, durable=False):
+    global bytes_written
+    path = os.path.abspath(path)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    journaled = JOURNAL_ENABLED and not durable
+    encoded = text.encode("utf-8")
+    _replace_with(path, encoded, sync=not journaled)
+    bytes_written += len(encoded)
+    if durable:
+        _fsync_directory(directory)
+        return
+    with _lock:
+        _pending_dirs.add(directory)
+        if journaled:
+            _journal_buffer[path] = text
+            _pending_files.add(path)
+    maybe_group_commit()
+
+
+def atomic_write_json(path, data, durable=False):
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False), durable=durable)
+
+
+def atomic_write_jsonl(path, records, durable=False):
+    lines = [json.dumps(record, ensure_ascii=False) + "\n" for record in records]
+    atomic_write_text(path, "".join(lines), durable=durable)
+
+
+def maybe_group_commit(force=False):
+    global _last_commit, _commits_since_checkpoint
+    now = time.monotonic()
+    if not force and now - _last_commit < GROUP_COMMIT_SECONDS:
+        return
+    with _lock:
+        directories = list(_pending_dirs)
+        _pending_dirs.clear()
+        entries = dict(_journal_buffer)
+        _journal_buffer.clear()
+        _last_commit = now
+    if entries:
+        _write_journal(entries)
+    for directory in directories:
+        _fsync_directory(directory)
+    if not JOURNAL_ENABLED:
+        return
+    _commits_since_checkpoint += 1
+    if force or _commits_since_checkpoint >= JOURNAL_CHECKPOINT_COMMITS:
+        with _lock:
+            paths = list(_pending_files)
+            _pending_files.clear()
+        for path in paths:
+            _fsync_file(path)
+        for directory in {os.path.dirname(path) for path in paths}:
+            _fsync_directory(directory)
+        # Every journaled payload is now durable in its target file.
+        if os.path.exists(JOURNAL_FILE):
+            open(JOURNAL_FILE, "wb").close()
+        _commits_since_checkpoint = 0
+
+
+def flush():
+    maybe_group_commit(force=True)
+
+
+def _is_valid_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            json.load(f)
+        return True
+    except Exception:
+        return False
+
+
+def _quarantine(path):
+    corrupt_path = f"{path}.corrupt-{int(time.time())}"
+    os.replace(path, corrupt_path)
+    print('[RECOVERY]:', 'moved unreadable', path, 'to', corrupt_path)
+
+
+def _is_complete(path):
+    # A file renamed into place is always a whole payload; missing, empty or unparsable
+    # content means its data never reached the disk.
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        if not text:
+            return False
+        if path.endswith(".jsonl"):
+            for line in text.splitlines():
+                json.loads(line)
+        else:
+            json.loads(text)
+        return True
+    except Exception:
+        return False
+
+
+def _replay_journal():
+    if not os.path.exists(JOURNAL_FILE):
+        return
+    journal_mtime = os.path.getmtime(JOURNAL_FILE)
+    latest = {}
+    with open(JOURNAL_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                latest[entry["path"]] = entry["data"]
+            except Exception:
+                # A torn tail means that commit never completed, everything before it is usable.
+                break
+    for path, text in latest.items():
+        # A complete target written after the last commit is newer than its journal entry.
+        if _is_complete(path) and os.path.getmtime(path) >= journal_mtime:
+            continue
+        _replace_with(path, text.encode("utf-8"))
+        _fsync_dir(path)
+        print('[RECOVERY]:', 'replayed journal entry for', path)
+    open(JOURNAL_FILE, "wb").close()
+
+
+def _repair_jsonl(path):
+    good_lines = []
+    damaged = False
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            try:
+                json.loads(line)
+                good_lines.append(line if line.endswith("\n") else line + "\n")
+            except Exception:
+                if line.strip():
+                    damaged = True
+    if damaged:
+        with open(path, "rb") as f:
+            original = f.read()
+        with open(f"{path}.corrupt-{int(time.time())}", "wb") as f:
+            f.write(original)
+        atomic_write_text(path, "".join(good_lines), durable=True)
+        print('[RECOVERY]:', 'dropped damaged lines from', path)
+
+
+def _remove_stale_tmp(path, cutoff):
+    if os.path.getmtime(path) < cutoff:
+        os.remove(path)
+        print('[RECOVERY]:', 'removed leftover', path)
+
+
+def recover_state_files(json_files=(), jsonl_folders=(), recent_seconds=2 * 86400):
+    # Writes go through temp + rename, so only files touched around the crash can be damaged;
+    # once a folder has had one full scan, older day files are left alone to keep startup
+    # fast on a long history.
+    _replay_journal()
+    tmp_cutoff = time.time() - STALE_TMP_SECONDS
+    for folder in {os.path.abspath(folder) for folder in jsonl_folders}:
+        if not os.path.isdir(folder):
+            continue
+        marker = os.path.join(folder, FULL_SCAN_MARKER)
+        cutoff = time.time() - recent_seconds if os.path.exists(marker) else 0
+        for filename in os.listdir(folder):
+            path = os.path.join(folder, filename)
+            if filename.endswith(TMP_SUFFIX):
+                _remove_stale_tmp(path, tmp_cutoff)
+            elif filename.endswith(".jsonl") and os.path.getmtime(path) >= cutoff:
+                _repair_jsonl(path)
+        if cutoff == 0:
+            atomic_write_text(marker, "", durable=True)
+            print('[RECOVERY]:', 'full scan of', folder, 'done')
+    for path in json_files:
+        path = os.path.abspath(path)
+        directory, basename = os.path.split(path)
+        for filename in os.listdir(directory) if os.path.isdir(directory) else ():
+            if filename.endswith(TMP_SUFFIX) and (
+                filename == basename + TMP_SUFFIX or filename.startswith("." + basename + ".")
+            ):
+                _remove_stale_tmp(os.path.join(directory, filename), tmp_cutoff)
+        if os.path.exists(path) and not _is_valid_json(path):
+            _quarantine(path)
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+import pytest
+import storage
+from backends import JsonStorage, SQLiteStorage
+
+DAY = "2026-10-19"
+START = datetime(2026, 10, 19, 12, 0, 0)
+SESSION_GAP = 7
+
+# (seconds after START, [(name, playtime, score)]). The empty tick at 15s and the pause until
+# 60s are both longer than the session gap, so "a" ends up with three sessions; two players
+# share the empty name.
+TICKS = [
+    (0, [("a", 30, 1), ("b", 5, 0), ("", 10, 2), ("", 3, 1)]),
+    (5, [("a", 35, 2), ("b", 10, 3), ("", 15, 2), ("", 8, 4)]),
+    (10, [("a", 40, 2), ("b", 15, 3)]),
+    (15, []),
+    (20, [("a", 50, 5), ("b", 25, 3)]),
+    (60, [("a", 2, 0), ("b", 65, 4)]),
+    (65, [("a", 7, 6), ("", 4, 1)]),
+]
+
+
+@pytest.fixture(autouse=True)
+def no_journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "JOURNAL_FILE", str(tmp_path / "state.journal"))
+    monkeypatch.setattr(storage, "JOURNAL_ENABLED", False)
+
+
+def replay(backend):
+    for offset, players in TICKS:
+        data = [
+            {'player_name': name, 'player_playtime': playtime, 'player_score': score, 'playtime_format': 'seconds'}
+            for name, playtime, score in players
+        ]
+        backend.record_tick(data, START + timedelta(seconds=offset), SESSION_GAP)
+    return backend
+
+
+@pytest.fixture
+def backends(tmp_path):
+    json_storage = replay(JsonStorage(
+        str(tmp_path / "users.json"), str(tmp_path / "server_time.json"), str(tmp_path / "stats")
+    ))
+    sqlite_storage = replay(SQLiteStorage(str(tmp_path / "tracker.db")))
+    yield json_storage, sqlite_storage
+    sqlite_storage.close()
+
+
+def comparable(records):
+    return {
+        name: (
+            record['last_seen'], record['timestamp'], record['player_playtime'], record['player_score'],
+            [(s['play_start'], s['play_end'], s['score']) for s in record['sessions']],
+        ) for name, record in records.items()
+    }
+
+
+def test_backends_store_the_same_day(backends):
+    json_storage, sqlite_storage = backends
+    json_day = json_storage.load_day(DAY)
+
+    assert comparable(json_day) == comparable(sqlite_storage.load_day(DAY))
+    assert len(json_day["a"]["sessions"]) == 3
+    assert set(json_day) == {"a", "b", ""}
+
+
+def test_backends_agree_on_player_totals(backends):
+    json_storage, sqlite_storage = backends
+    json_totals = json_storage.player_totals([DAY])
+
+    assert json_totals == sqlite_storage.player_totals([DAY])
+    assert set(json_totals) == {"a", "b", "NoName"}
+
+
+def test_tick_saves_server_time(backends):
+    for backend in backends:
+        assert backend.load_last_server_time() == START + timedelta(seconds=TICKS[-1][0])
+
+
+def test_import_day_round_trips(backends, tmp_path):
+    json_storage, _ = backends
+    imported = SQLiteStorage(str(tmp_path / "imported.db"))
+    imported.import_day(DAY, json_storage.load_day(DAY))
+
+    assert comparable(imported.load_day(DAY)) == comparable(json_storage.load_day(DAY))
+    assert imported.player_totals([DAY]) == json_storage.player_totals([DAY])
+    imported.close()
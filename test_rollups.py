@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+import pytest
+import storage
+import rollups
+from analyzer import app_timezone
+from backends import JsonStorage
+from rollups import DailyRollups
+from trends import trend_report
+
+SESSION_GAP = 7
+
+
+@pytest.fixture(autouse=True)
+def no_journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "JOURNAL_FILE", str(tmp_path / "state.journal"))
+    monkeypatch.setattr(storage, "JOURNAL_ENABLED", False)
+
+
+def days_ago(count):
+    return (datetime.now(app_timezone) - timedelta(days=count)).replace(hour=12, minute=0, second=0, microsecond=0)
+
+
+def play(backend, name, when, seconds, score):
+    # Two ticks `seconds` apart give one session of exactly that length.
+    for offset, tick_score in ((0, 0), (seconds, score)):
+        backend.record_tick(
+            [{'player_name': name, 'player_playtime': offset, 'player_score': tick_score}],
+            when + timedelta(seconds=offset), SESSION_GAP + seconds,
+        )
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    backend = JsonStorage(str(tmp_path / "users.json"), str(tmp_path / "server_time.json"), str(tmp_path / "stats"))
+    # "regular" played long ago and in both trend weeks, "gone" only in the previous week,
+    # "newcomer" only today.
+    play(backend, "regular", days_ago(20), 60, 1)
+    play(backend, "regular", days_ago(10), 120, 2)
+    play(backend, "gone", days_ago(9), 30, 1)
+    play(backend, "regular", days_ago(2), 300, 5)
+    play(backend, "newcomer", days_ago(0), 45, 3)
+    daily = DailyRollups(backend, path=str(tmp_path / "rollups.json"), timezone=app_timezone)
+    monkeypatch.setattr(rollups, "_rollups", daily)
+    return backend, daily
+
+
+def day(when):
+    return when.strftime("%Y-%m-%d")
+
+
+def test_period_sums_closed_days_and_today(history):
+    _, daily = history
+    totals = daily.period([day(days_ago(10)), day(days_ago(2)), day(days_ago(0))])
+
+    assert totals == {
+        "regular": {"total_seconds": 420, "total_score": 7},
+        "newcomer": {"total_seconds": 45, "total_score": 3},
+    }
+
+
+def test_first_seen_is_earliest_closed_day(history):
+    _, daily = history
+    daily.refresh()
+
+    assert daily.first_seen == {"regular": day(days_ago(20)), "gone": day(days_ago(9))}
+
+
+def test_closed_days_are_persisted(history, tmp_path):
+    backend, daily = history
+    daily.refresh()
+
+    reloaded = DailyRollups(backend, path=str(tmp_path / "rollups.json"), timezone=app_timezone)
+    reloaded._load()
+
+    assert reloaded.days == daily.days
+    assert day(days_ago(0)) not in reloaded.days
+
+
+def test_week_over_week_counts(history):
+    report = trend_report("week_over_week")
+
+    assert report['current_total'] == 2
+    assert report['previous_total'] == 2
+    assert report['new'] == 1
+    assert report['returning'] == 1
+    assert report['churned'] == 1
+    assert report['churn_rate'] == 50
+    assert [player['name'] for player in report['players']] == ["regular", "newcomer", "gone"]
@@ -0,0 +1,50 @@
+import multiprocessing
+from snapshot import SnapshotWriter, SnapshotReader
+
+PUBLISHES = 3000
+
+
+def _publish(path, started):
+    writer = SnapshotWriter(path, size=64 * 1024)
+    started.set()
+    for n in range(1, PUBLISHES + 1):
+        # Payload length changes every time, so a torn read would not parse or not match.
+        writer.publish({'n': n, 'players': ['p'] * (n % 200), 'check': n * 7})
+    writer.close()
+
+
+def test_reader_never_sees_torn_or_older_snapshot(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    SnapshotWriter(path, size=64 * 1024).close()
+    started = multiprocessing.Event()
+    writer = multiprocessing.Process(target=_publish, args=(path, started))
+    writer.start()
+    started.wait(10)
+    reader = SnapshotReader(path)
+    last = 0
+    reads = 0
+    try:
+        while writer.is_alive():
+            data = reader.read()
+            if data is None:
+                continue
+            assert data['check'] == data['n'] * 7
+            assert len(data['players']) == data['n'] % 200
+            assert data['n'] >= last
+            last = data['n']
+            reads += 1
+        writer.join(10)
+        last = reader.read()['n']
+    finally:
+        reader.close()
+    assert writer.exitcode == 0
+    assert last == PUBLISHES
+    assert reads > 1
+
+
+def test_reader_returns_none_before_first_publish(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    SnapshotWriter(path, size=4096).close()
+    reader = SnapshotReader(path)
+    assert reader.read() is None
+    reader.close()
@@ -0,0 +1,146 @@
+import os, json
+import pytest
+import storage
+
+
+@pytest.fixture(autouse=True)
+def journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "JOURNAL_FILE", str(tmp_path / "state.journal"))
+    monkeypatch.setattr(storage, "JOURNAL_ENABLED", False)
+    monkeypatch.setattr(storage, "_pending_dirs", set())
+    monkeypatch.setattr(storage, "_pending_files", set())
+    monkeypatch.setattr(storage, "_journal_buffer", {})
+    monkeypatch.setattr(storage, "_commits_since_checkpoint", 0)
+    return tmp_path / "state.journal"
+
+
+def test_torn_jsonl_line_is_dropped(tmp_path):
+    folder = tmp_path / "stats"
+    folder.mkdir()
+    day = folder / "2026-10-19.jsonl"
+    day.write_text('{"name": "a", "score": 1}\n{"name": "b", "sco', encoding="utf-8")
+
+    storage.recover_state_files(jsonl_folders=[str(folder)])
+
+    assert day.read_text(encoding="utf-8") == '{"name": "a", "score": 1}\n'
+    assert any(name.startswith("2026-10-19.jsonl.corrupt-") for name in os.listdir(folder))
+
+
+def test_stale_temp_files_are_removed(tmp_path):
+    folder = tmp_path / "stats"
+    folder.mkdir()
+    stale = folder / ".players-2026-10-19.jsonl.abc123.tmp"
+    stale.write_text('{"name": "a"', encoding="utf-8")
+    os.utime(stale, (0, 0))
+    fresh = folder / ".players-2026-10-19.jsonl.def456.tmp"
+    fresh.write_text('{"name": "a"', encoding="utf-8")
+
+    storage.recover_state_files(jsonl_folders=[str(folder)])
+
+    # A fresh temp file may still be in use by a writer in another process.
+    assert sorted(os.listdir(folder)) == sorted([fresh.name, storage.FULL_SCAN_MARKER])
+
+
+def test_atomic_write_leaves_no_temp_files(tmp_path):
+    users = tmp_path / "users.json"
+    storage.atomic_write_json(str(users), {"1": {"lang": "en"}})
+    storage.atomic_write_json(str(users), {"1": {"lang": "ru"}})
+
+    assert os.listdir(tmp_path) == ["users.json"]
+    assert json.loads(users.read_text(encoding="utf-8")) == {"1": {"lang": "ru"}}
+
+
+def test_invalid_users_json_is_quarantined(tmp_path):
+    users = tmp_path / "users.json"
+    users.write_text('{"1": {"lang": "en"', encoding="utf-8")
+
+    storage.recover_state_files(json_files=[str(users)])
+
+    assert not users.exists()
+    assert any(name.startswith("users.json.corrupt-") for name in os.listdir(tmp_path))
+
+
+def test_valid_users_json_is_kept(tmp_path):
+    users = tmp_path / "users.json"
+    storage.atomic_write_json(str(users), {"1": {"lang": "en"}}, durable=True)
+
+    storage.recover_state_files(json_files=[str(users)])
+
+    assert json.loads(users.read_text(encoding="utf-8")) == {"1": {"lang": "en"}}
+
+
+def test_journal_replays_lost_write(tmp_path, journal, monkeypatch):
+    monkeypatch.setattr(storage, "JOURNAL_ENABLED", True)
+    monkeypatch.setattr(storage, "GROUP_COMMIT_SECONDS", 0)
+    monkeypatch.setattr(storage, "JOURNAL_CHECKPOINT_COMMITS", 1000)
+    users = tmp_path / "users.json"
+    storage.atomic_write_json(str(users), {"1": {"lang": "en"}})
+    assert journal.read_text(encoding="utf-8")
+    # Simulate a power loss that kept the journal but not the unsynced target data.
+    users.write_text("", encoding="utf-8")
+
+    storage.recover_state_files(json_files=[str(users)])
+
+    assert json.loads(users.read_text(encoding="utf-8")) == {"1": {"lang": "en"}}
+    assert journal.read_text(encoding="utf-8") == ""
+
+
+def test_journal_keeps_newer_target(tmp_path, journal):
+    users = tmp_path / "users.json"
+    journal.write_text(json.dumps({"path": str(users), "data": '{"1": "old"}'}) + "\n", encoding="utf-8")
+    users.write_text('{"1": "new"}', encoding="utf-8")
+    os.utime(journal, (0, 0))
+
+    storage.recover_state_files(json_files=[str(users)])
+
+    assert json.loads(users.read_text(encoding="utf-8")) == {"1": "new"}
+
+
+def test_journal_torn_tail_is_ignored(tmp_path, journal):
+    users = tmp_path / "users.json"
+    journal.write_text(
+        json.dumps({"path": str(users), "data": '{"1": "committed"}'}) + "\n" + '{"path": "x", "da',
+        encoding="utf-8",
+    )
+
+    storage.recover_state_files(json_files=[str(users)])
+
+    assert json.loads(users.read_text(encoding="utf-8")) == {"1": "committed"}
+
+
+def test_first_recovery_scans_old_day_files(tmp_path):
+    folder = tmp_path / "stats"
+    folder.mkdir()
+    day = folder / "players-2024-01-01.jsonl"
+    day.write_text('{"name": "a"}\n{"name": ', encoding="utf-8")
+    os.utime(day, (0, 0))
+
+    storage.recover_state_files(jsonl_folders=[str(folder)])
+
+    assert day.read_text(encoding="utf-8") == '{"name": "a"}\n'
+    assert (folder / storage.FULL_SCAN_MARKER).exists()
+
+    day.write_text('{"name": "a"}\n{"name": ', encoding="utf-8")
+    os.utime(day, (0, 0))
+    storage.recover_state_files(jsonl_folders=[str(folder)])
+
+    # After the full scan only recently modified files are checked.
+    assert day.read_text(encoding="utf-8") == '{"name": "a"}\n{"name": '
+
+
+def test_rewrite_keeps_file_mode(tmp_path):
+    users = tmp_path / "users.json"
+    users.write_text("{}", encoding="utf-8")
+    os.chmod(users, 0o644)
+
+    storage.atomic_write_json(str(users), {"1": {"lang": "en"}})
+
+    assert os.stat(users).st_mode & 0o777 == 0o644
+
+
+def test_new_file_follows_umask(tmp_path):
+    day = tmp_path / "players-2026-10-19.jsonl"
+
+    storage.atomic_write_jsonl(str(day), [{"name": "a"}])
+
+    assert os.stat(day).st_mode & 0o777 == 0o666 & ~storage._UMASK
@@ -0,0 +1,68 @@
+from calendar import monthrange
+from datetime import datetime, timedelta
+from analyzer import app_timezone, format_playtime
+from rollups import get_rollups
+
+
+def _days(start, count):
+    return [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(count)]
+
+
+def get_trend_ranges(option: str):
+    today = datetime.now(app_timezone)
+    if option == "week_over_week":
+        current = _days(today - timedelta(days=6), 7)
+        previous = _days(today - timedelta(days=13), 7)
+    elif option == "month_over_month":
+        # Month to date against the same span of the previous month, so a partial month
+        # is never compared with a complete one.
+        start = today.replace(day=1)
+        previous_start = (start - timedelta(days=1)).replace(day=1)
+        previous_length = min(today.day, monthrange(previous_start.year, previous_start.month)[1])
+        current = _days(start, today.day)
+        previous = _days(previous_start, previous_length)
+    else:
+        raise ValueError("Invalid option. Choose from: week_over_week, month_over_month")
+    return current, previous
+
+
+def trend_report(option, language="EN"):
+    rollups = get_rollups()
+    current_days, previous_days = get_trend_ranges(option)
+    current = rollups.period(current_days)
+    previous = rollups.period(previous_days)
+    if not current and not previous:
+        return None
+
+    period_start = current_days[0]
+    new_players = {
+        name for name in current
+        if rollups.first_seen.get(name, period_start) >= period_start
+    }
+    returning_players = [name for name in current if name not in new_players]
+    churned_players = [name for name in previous if name not in current]
+    churn_rate = round(100 * len(churned_players) / len(previous)) if previous else 0
+
+    players = []
+    for name in set(current) | set(previous):
+        current_seconds = current.get(name, {}).get("total_seconds", 0)
+        previous_seconds = previous.get(name, {}).get("total_seconds", 0)
+        delta_seconds = current_seconds - previous_seconds
+        players.append({
+            'name': name,
+            'current': format_playtime(current_seconds, language) if current_seconds else '-',
+            'previous': format_playtime(previous_seconds, language) if previous_seconds else '-',
+            'delta_seconds': delta_seconds,
+            'delta': ('+' if delta_seconds > 0 else '-') + format_playtime(abs(delta_seconds), language) if delta_seconds else '0',
+        })
+    players.sort(key=lambda p: p['delta_seconds'], reverse=True)
+
+    return {
+        'current_total': len(current),
+        'previous_total': len(previous),
+        'new': len(new_players),
+        'returning': len(returning_players),
+        'churned': len(churned_players),
+        'churn_rate': churn_rate,
+        'players': players,
+    }
@@ -1,47 +1,48 @@
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
-from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, CallbackQueryHandler, MessageHandler, filters 
-import json, os, asyncio, valve.source.a2s, time
-from PIL import Image, ImageDraw, ImageFont
-from valve.source import a2s, NoResponseError
+from __future__ import annotations
+# telegram, PIL and valve are imported where they are first used, so the tracker can start
+# polling before the heavy packages have finished loading.
+import os, asyncio, time, uuid, signal, argparse, threading, multiprocessing
+from typing import TYPE_CHECKING
 from io import BytesIO
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from datetime import datetime
 from analyzer import players_analyzer, app_timezone as operating_timezone
-from zoneinfo import ZoneInfo
+from trends import trend_report
+from backends import get_storage, USER_FILE, SERVER_TIME_FILE, STATS_FOLDER
+from storage import recover_state_files, try_lock_file, enable_journal, flush as flush_state
+from snapshot import SnapshotWriter, SnapshotReader
+from replay import record_server_reply
+from diagnostics import capture_profile, install_signal_handler, is_admin, request_profile, wait_for_report
+from warmstate import save_warm_state, restore_warm_state
+
+if TYPE_CHECKING:
+    from telegram import Update
+    from telegram.ext import ContextTypes
 
-USER_FILE = "users.json"
 server_address = ("46.174.50.10", 27236)
 app_timezone = operating_timezone #ZoneInfo("Europe/Moscow")
 server_data = {}
-moscow_time = datetime.now(ZoneInfo("Europe/Moscow"))
-tashkent_time = datetime.now(ZoneInfo("Asia/Tashkent"))
-today = moscow_time.date()
-
+# Set in split deployments: the tracker publishes each poll, bot workers read it instead of polling.
+snapshot_writer = None
+snapshot_reader = None
 SESSION_GAP_SECONDS = 7
-
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-SERVER_TIME_FILE = os.path.join(SCRIPT_DIR, "server_time.json")
+WARM_STATE_EVERY_TICKS = 100
+# Older snapshots mean the tracker is stuck or down; bot workers then query the server themselves.
+SNAPSHOT_MAX_AGE = 30
+TRACKER_RESTART_DELAY = 5
+# Telegram allows one getUpdates poller per token, a second one fails with 409 Conflict.
+BOT_LOCK_FILE = "bot.lock"
+STATS_PAGE_SIZE = 20
+MAX_CACHED_RESULTS = 200
+
+# handle -> {'header', 'rows', 'format'}; rows are only formatted when their page is shown.
+cached_results = OrderedDict()
 
 def load_users():
-    if not os.path.exists(USER_FILE):
-        return {}
-    with open(USER_FILE, "r") as f:
-        try:
-            return json.load(f)
-        except: return {}
+    return get_storage().load_users()
 
 def load_last_server_time():
-    if os.path.exists(SERVER_TIME_FILE):
-        try:
-            with open(SERVER_TIME_FILE, 'r') as f:
-                data = json.load(f)
-                return datetime.fromisoformat(data['last_time'])
-        except Exception:
-            pass
-    return None
-
-def save_current_server_time(now):
-    with open(SERVER_TIME_FILE, 'w') as f:
-        json.dump({'last_time': now.isoformat()}, f)
+    return get_storage().load_last_server_time()
 
 month_translation = {
     "January": "Январь",
@@ -58,86 +59,17 @@ month_translation = {
     "December": "Декабрь"
 }
 
+def current_time():
+    return datetime.now(app_timezone)
+
 def save_players_stats(data):
-    os.makedirs("stats", exist_ok=True)
-    date_str = datetime.now(app_timezone).strftime("%Y-%m-%d")
-    filepath = os.path.join("stats", f"players-{date_str}.jsonl")
-
-    existing_data = {}
-    if os.path.exists(filepath):
-        with open(filepath, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    record = json.loads(line)
-                    name = record['player_name']
-                    existing_data[name] = record
-                except:
-                    continue
-
-    now = datetime.now(app_timezone)
+    now = current_time()
     last_server_time = load_last_server_time()
     downtime = max(0, (now - last_server_time).total_seconds()) if last_server_time else 0
     session_gap = max(SESSION_GAP_SECONDS, downtime)
     if downtime > SESSION_GAP_SECONDS: print('[DOWNTIME]:', 'adjusted for', int(downtime), 'seconds')
-    for record in data:
-        name = record['player_name']
-        playtime = record['player_playtime']
-        score = record.get('player_score', 0)
-        now_iso = now.isoformat()
-
-        if name not in existing_data:
-            play_start = (now - timedelta(seconds=playtime)).isoformat()
-            record['timestamp'] = now_iso
-            record['last_seen'] = now_iso
-            record['sessions'] = [{
-                'play_start': play_start,
-                'play_end': now_iso,
-                'score': score
-            }]
-            existing_data[name] = record
-
-        else:
-            saved = existing_data[name]
-            last_seen_str = saved.get('last_seen')
-            last_seen = datetime.fromisoformat(last_seen_str) if last_seen_str else now
-            time_diff = (now - last_seen).total_seconds()
-
-            saved['last_seen'] = now_iso
-
-            if 'sessions' not in saved or not saved['sessions']:
-                play_start = (now - timedelta(seconds=playtime)).isoformat()
-                saved['sessions'] = [{
-                    'play_start': play_start,
-                    'play_end': now_iso,
-                    'score': score
-                }]
-            else:
-                last_session = saved['sessions'][-1]
-                if time_diff <= session_gap:
-                    last_session['play_end'] = now_iso
-                    if score > last_session.get('score', 0):
-                        last_session['score'] = score
-                else:
-                    saved['sessions'].append({
-                        'play_start': now_iso,
-                        'play_end': now_iso,
-                        'score': score
-                    })
-            if playtime > saved.get('player_playtime', 0):
-                saved['player_playtime'] = playtime
-                saved['timestamp'] = now_iso
-            if score > saved.get('player_score', 0):
-                saved['player_score'] = score
-
-    try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            for record in existing_data.values():
-                json.dump(record, f, ensure_ascii=False)
-                f.write("\n")
-    except Exception as e:
-        print('Error occurred when saving:', e)
-
-    save_current_server_time(now)
+    # Records the tick and the server time together, in one transaction where the backend has them.
+    get_storage().record_tick(data, now, session_gap)
 
 def PlayersStat(data):
     records = []
@@ -164,18 +96,14 @@ def getUserLanguage(data={}):
     return language
 
 def load_user_schedule(user_id):
-    if not os.path.exists(USER_FILE):
-        return {}
-    with open(USER_FILE, "r") as f:
-        try:
-            data = json.load(f)
-            user_data = data.get(user_id)
-            return user_data.get('players_alarm')
-        except: return 0
+    user_data = load_users().get(user_id) or {}
+    return user_data.get('players_alarm', 0)
 
 def save_users(users):
-    with open(USER_FILE, "w") as f:
-        json.dump(users, f)
+    get_storage().save_users(users)
+
+def save_user(user_id, user_data):
+    get_storage().save_user(user_id, user_data)
 
 def russian_form(count: int) -> str:
     if 11 <= count % 100 <= 14:
@@ -190,6 +118,7 @@ def russian_form(count: int) -> str:
 
 
 def render_text_image(text, font_size=30, padding=30, line_spacing=6):
+    from PIL import Image, ImageDraw, ImageFont
     font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf"
     font = ImageFont.truetype(font_path, font_size)
     lines = text.split("\n")
@@ -277,33 +206,66 @@ def build_players_string(players_list, server_info, lang="EN"):
         lines.append('##################################')
     return "\n".join(lines)
 
+def fresh_snapshot():
+    data = snapshot_reader.read() or {}
+    if data and (datetime.now(app_timezone) - datetime.fromisoformat(data['updated_at'])).total_seconds() > SNAPSHOT_MAX_AGE:
+        print('[SNAPSHOT]:', 'stale since', data['updated_at'])
+        return {}
+    return data
+
+def current_server_data():
+    if snapshot_reader is not None:
+        return fresh_snapshot()
+    return server_data
+
+def publish_snapshot(players_count, alarms_fired):
+    if snapshot_writer is None:
+        return
+    players = server_data.get('players', {})
+    snapshot_writer.publish({
+        'info': server_data.get('info', {}),
+        'players': {**players, 'players': [dict(player) for player in players.get('players', [])]},
+        'players_count': players_count,
+        'alarms_fired': alarms_fired,
+        'pid': os.getpid(),
+        'updated_at': datetime.now(app_timezone).isoformat(),
+    })
+
 def LocalParser(serverData, language):
     info = serverData.get('info')
     players_data = serverData.get('players')
     players_list = get_players(players_data, language)
     return build_players_string(players_list, info, lang=language)
 
-def GetServerData(user_lang="EN", for_background_task=False):
+def query_server():
+    from valve.source import a2s
+    with a2s.ServerQuerier(server_address) as server:
+        info = server.info()
+        players_data = server.players()
+    record_server_reply(info, players_data)
+    return info, players_data
+
+def GetServerData(user_lang="EN", for_background_task=False, record_stats=True):
+    from valve.source import NoResponseError
     max_retries = 3
     delay = 1  # seconds
 
     for attempt in range(1, max_retries + 1):
         try:
-            with a2s.ServerQuerier(server_address) as server:
-                global server_data 
-                info = server.info()
-                players_data = server.players()
-                server_data = {
-                    "info": dict(info),
-                    "players": dict(players_data)
-                }
+            global server_data 
+            info, players_data = query_server()
+            server_data = {
+                "info": dict(info),
+                "players": dict(players_data)
+            }
+            if record_stats:
                 PlayersStat(server_data['players']['players'])
-                players_list = get_players(players_data, user_lang)
-                
-                if not for_background_task:
-                    return build_players_string(players_list, info, lang=user_lang)
-                else:
-                    return players_data, players_list
+            players_list = get_players(players_data, user_lang)
+            
+            if not for_background_task:
+                return build_players_string(players_list, info, lang=user_lang)
+            else:
+                return players_data, players_list
 
         except NoResponseError as e:
             print(f"[WARN] Attempt {attempt}/{max_retries}: No response from server: {e}")
@@ -323,10 +285,8 @@ LANGUAGE_CHOICES = [["EN", "RU"]]
 
 async def set_language(update: Update, context: ContextTypes.DEFAULT_TYPE, lang_code: str):
     user_id = str(update.effective_user.id)
-    users = load_users()
     players_alarm = load_user_schedule(user_id)
-    users[user_id] = {'language': lang_code, 'players_alarm': players_alarm}
-    save_users(users)
+    save_user(user_id, {'language': lang_code, 'players_alarm': players_alarm})
 
     message_text = (
         "✅ Language set to English." if lang_code == "EN"
@@ -383,6 +343,7 @@ async def handle_status_button(update: Update, context: ContextTypes.DEFAULT_TYP
 
 
 def get_main_menu(lang):
+    from telegram import ReplyKeyboardMarkup, KeyboardButton
     if lang == "RU":
         return ReplyKeyboardMarkup(
             [[KeyboardButton("Проверить Статус")]],
@@ -395,6 +356,7 @@ def get_main_menu(lang):
         )
 
 async def greet(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     keyboard = [
         [InlineKeyboardButton("🇬🇧 English", callback_data="/en"),
          InlineKeyboardButton("🇷🇺 Русский", callback_data="/ru")]
@@ -454,6 +416,7 @@ async def handle_language_button(update: Update, context: ContextTypes.DEFAULT_T
         await set_language(update=update, context=context, lang_code="RU")
 
 def cube_inline_keyboard(lang):
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     if lang == "RU":
         buttons = [
             [
@@ -463,6 +426,10 @@ def cube_inline_keyboard(lang):
             [
                 InlineKeyboardButton("За неделю", callback_data="weekly-stats"),
                 InlineKeyboardButton("За месяц", callback_data="monthly-stats")
+            ],
+            [
+                InlineKeyboardButton("Неделя к неделе", callback_data="wow-trends"),
+                InlineKeyboardButton("Месяц к месяцу", callback_data="mom-trends")
             ]
         ]
     else:
@@ -474,12 +441,17 @@ def cube_inline_keyboard(lang):
             [
                 InlineKeyboardButton("Weekly", callback_data="weekly-stats"),
                 InlineKeyboardButton("Monthly", callback_data="monthly-stats")
+            ],
+            [
+                InlineKeyboardButton("Week vs Week", callback_data="wow-trends"),
+                InlineKeyboardButton("Month vs Month", callback_data="mom-trends")
             ]
         ]
     return InlineKeyboardMarkup(buttons)
 
 
 def get_persistent_menu(lang):
+    from telegram import ReplyKeyboardMarkup, KeyboardButton
     if lang == "RU":
         buttons = [
             [KeyboardButton("🎮 Проверить Статус")],
@@ -505,8 +477,8 @@ async def check_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     users = load_users()
     requesting_user = users.get(user_id, {})
     lang = requesting_user.get('language', "EN")
-    data_exists = len(server_data.keys()) > 0
-    text_output = LocalParser(server_data, lang) if data_exists else GetServerData(user_lang=lang)
+    data = current_server_data()
+    text_output = LocalParser(data, lang) if data else GetServerData(user_lang=lang, record_stats=snapshot_reader is None)
     img = render_text_image(text_output, font_size=30)
     buffer = BytesIO()
     img.save(buffer, format="PNG")
@@ -519,6 +491,7 @@ async def check_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
 
 def get_alarm_inline_keyboard(lang):
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     if lang == "RU":
         buttons = [
             [InlineKeyboardButton("🔔 1-2 Игрока", callback_data="/alarm-set-2")],
@@ -568,8 +541,8 @@ async def handle_alarm_selection(update: Update, context: ContextTypes.DEFAULT_T
     except Exception:
         players = 0
 
-    users[user_id]['players_alarm'] = players
-    save_users(users)
+    user['players_alarm'] = players
+    save_user(user_id, user)
     success_msg = (
         f"✅ You'll be notified when there are {alarm_plans[players]} players on the server." if lang == "EN"
         else f"✅ Получите уведомление когда на сервере будет {alarm_plans[players]} {russian_form(players)}."
@@ -577,8 +550,8 @@ async def handle_alarm_selection(update: Update, context: ContextTypes.DEFAULT_T
     await query.edit_message_text(success_msg)
 
 async def AlertMessageSender(app, user_id: str, lang: str = "EN", message: str = "EN"):
-    data_exists = len(server_data.keys()) > 0
-    text_output = LocalParser(server_data, lang) if data_exists else GetServerData(user_lang=lang)
+    data = current_server_data()
+    text_output = LocalParser(data, lang) if data else GetServerData(user_lang=lang, record_stats=snapshot_reader is None)
     img = render_text_image(text_output, font_size=30)
     buffer = BytesIO()
     img.save(buffer, format="PNG")
@@ -600,7 +573,7 @@ async def AlertMessageSender(app, user_id: str, lang: str = "EN", message: str =
 def reset_alarm(users={}, user_id='', language="EN"):
     if len(users.keys()) and len(user_id) > 5:
         users[user_id] =  {"language": language, "players_alarm": 0}
-        save_users(users)
+        save_user(user_id, users[user_id])
     else: print('user alert reset failed!')
 
 async def AlertUser(app, user_id, player_count, language, users):
@@ -615,24 +588,39 @@ async def AlertUser(app, user_id, player_count, language, users):
     except Exception as e:
         print(f"[ALERT ERROR] Could not notify user {user_id}: {e}")
 
-async def background_player_tracker(app):
+async def tracker_tick(app):
+    result = GetServerData(for_background_task=True)
+    if result is None:
+        return None
+    players_data, players_list = result
+    players_count = len(players_list)
+    print(f"[Tracker] players: {players_count}")
+
+    users = get_storage().load_alarm_users()
+    alarms_fired = 0
+    for user_id, data in users.items():
+        alarm_value = data.get("players_alarm", 0)
+        language = data.get("language", 'EN')
+        if is_alarm_triggered(alarm_value, players_count): 
+            await AlertUser(app, user_id, players_count, language, users)
+            alarms_fired += 1
+    publish_snapshot(players_count, alarms_fired)
+    return players_count
+
+async def background_player_tracker(app, started=None):
+    ticks = 0
     while True:
-        result = GetServerData(for_background_task=True)
-        if result is None:
+        if await tracker_tick(app) is None:
             print("[Tracker] Failed to get server data. Retrying after delay...")
             await asyncio.sleep(3.5)
             continue
-        players_data, players_list = result
-        players_count = len(players_list)
-        print(f"[Tracker] players: {players_count}")
-
-        users = load_users()
-        for user_id, data in users.items():
-            alarm_value = data.get("players_alarm", 0)
-            language = data.get("language", 'EN')
-            if is_alarm_triggered(alarm_value, players_count): 
-                await AlertUser(app, user_id, players_count, language, users)
-
+        ticks += 1
+        if ticks == 1 and started is not None:
+            print('[STARTUP]:', f'first poll after {time.perf_counter() - started:.2f}s')
+        if ticks % WARM_STATE_EVERY_TICKS == 0:
+            # Day records are left out: after a crash the day file has moved on and they
+            # would be rejected anyway. The shutdown save includes them.
+            save_warm_state(include_day=False)
         await asyncio.sleep(3.3)
 
 
@@ -647,7 +635,7 @@ async def handle_stats_selection(update: Update, context: ContextTypes.DEFAULT_T
     callback = query.data
     def english_hints(): return '\n\n______ PLAYER  →  PLAYED  →  SCORE ____'
     def russian_hints(): return '\n\n______ ИГРОК  →  ИГРАЛ(а)  →  ОЧКИ ___'
-    month_name = today.strftime("%B")
+    month_name = datetime.now(app_timezone).strftime("%B")
     operation_identifiers = {
         "today-stats" : 'today',
         "yesterday-stats" : 'yesterday',
@@ -679,37 +667,319 @@ async def handle_stats_selection(update: Update, context: ContextTypes.DEFAULT_T
             "EN": "⚠️ No data available for this period.",
             "RU": "⚠️ Нет данных за этот период."
         }.get(lang, "⚠️ No data.")
-    else:
-        selected_label += english_hints() if lang == 'EN' else russian_hints()
-        lines = []
-        for index, entry in enumerate(stats, start=1):
-            lines.append(f"{index}  👤{entry['name']} | 🕹️{entry['gameplay']} | 🧮 {entry['score']}")
-        message = "\n".join(lines)
+        await query.edit_message_text(f"{selected_label}\n\n{message}")
+        return
 
-    final_text = f"{selected_label}\n\n{message}"
-    await query.edit_message_text(final_text)
+    selected_label += english_hints() if lang == 'EN' else russian_hints()
+    handle = cache_result(
+        selected_label, stats,
+        lambda index, entry: f"{index}  👤{entry['name']} | 🕹️{entry['gameplay']} | 🧮 {entry['score']}"
+    )
+    await show_result_page(query, handle, 0)
+
+def cache_result(header, rows, row_format):
+    handle = uuid.uuid4().hex[:12]
+    cached_results[handle] = {'header': header, 'rows': rows, 'format': row_format}
+    while len(cached_results) > MAX_CACHED_RESULTS:
+        cached_results.popitem(last=False)
+    return handle
+
+def page_navigation_keyboard(handle, page, page_count):
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+    if page_count <= 1:
+        return None
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton("◀️", callback_data=f"page:{handle}:{page - 1}"))
+    buttons.append(InlineKeyboardButton(f"{page + 1}/{page_count}", callback_data="page:noop"))
+    if page < page_count - 1:
+        buttons.append(InlineKeyboardButton("▶️", callback_data=f"page:{handle}:{page + 1}"))
+    return InlineKeyboardMarkup([buttons])
+
+async def show_result_page(query, handle, page):
+    result = cached_results[handle]
+    cached_results.move_to_end(handle)
+    rows = result['rows']
+    page_count = max(1, -(-len(rows) // STATS_PAGE_SIZE))
+    page = min(max(page, 0), page_count - 1)
+    start = page * STATS_PAGE_SIZE
+    lines = [
+        result['format'](index, entry)
+        for index, entry in enumerate(rows[start:start + STATS_PAGE_SIZE], start=start + 1)
+    ]
+    text = result['header'] + "\n\n" + "\n".join(lines)
+    await query.edit_message_text(text, reply_markup=page_navigation_keyboard(handle, page, page_count))
 
-async def start_background_tasks(app):
-    app.create_task(background_player_tracker(app))
+async def handle_page_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    parts = query.data.split(":")
+    if len(parts) != 3 or parts[1] not in cached_results:
+        user = load_users().get(str(query.from_user.id), {})
+        expired = "⌛ Results expired, request them again." if user.get('language', 'EN') == 'EN' else "⌛ Результаты устарели, запросите снова."
+        await query.answer(expired if len(parts) == 3 else None)
+        return
+    await query.answer()
+    try:
+        page = int(parts[2])
+    except ValueError:
+        page = 0
+    await show_result_page(query, parts[1], page)
 
-def main():
-    app = (
-        ApplicationBuilder()
-        .token(BOT_TOKEN)
-        .post_init(start_background_tasks)
-        .build()
+async def handle_trend_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    user_id = str(query.from_user.id)
+    users = load_users()
+    user = users.get(user_id, {})
+    lang = user.get('language', 'EN')
+    await query.answer()
+    callback = query.data
+    operation_identifiers = {
+        "wow-trends": 'week_over_week',
+        "mom-trends": 'month_over_month',
+    }
+    header_text = {
+        "EN": {
+            "wow-trends": "📈 This Week vs Last Week",
+            "mom-trends": "📊 This Month vs Last Month",
+        },
+        "RU": {
+            "wow-trends": "📈 Эта неделя против прошлой",
+            "mom-trends": "📊 Этот месяц против прошлого",
+        }
+    }
+    selected_label = header_text.get(lang, header_text["EN"]).get(callback, "📊 Trends")
+    report = trend_report(operation_identifiers.get(callback, 'week_over_week'), lang)
+
+    if not report:
+        message = {
+            "EN": "⚠️ No data available for this period.",
+            "RU": "⚠️ Нет данных за этот период."
+        }.get(lang, "⚠️ No data.")
+        await query.edit_message_text(f"{selected_label}\n\n{message}")
+        return
+
+    if lang == 'RU':
+        summary = (
+            f"👥 Игроков: {report['current_total']} (было {report['previous_total']})\n"
+            f"🆕 Новые: {report['new']} | 🔁 Вернувшиеся: {report['returning']}\n"
+            f"🚪 Ушли: {report['churned']} ({report['churn_rate']}%)"
+            '\n\n___ ИГРОК  →  СЕЙЧАС  →  РАНЬШЕ  →  РАЗНИЦА ___'
+        )
+    else:
+        summary = (
+            f"👥 Players: {report['current_total']} (was {report['previous_total']})\n"
+            f"🆕 New: {report['new']} | 🔁 Returning: {report['returning']}\n"
+            f"🚪 Churned: {report['churned']} ({report['churn_rate']}%)"
+            '\n\n___ PLAYER  →  NOW  →  BEFORE  →  CHANGE ___'
+        )
+    handle = cache_result(
+        f"{selected_label}\n\n{summary}", report['players'],
+        lambda index, entry: f"{index}  👤{entry['name']} | {entry['current']} | {entry['previous']} | {entry['delta']}"
     )
+    await show_result_page(query, handle, 0)
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update.effective_user.id):
+        return
+    try:
+        seconds = int(context.args[0]) if context.args else 30
+    except ValueError:
+        seconds = 30
+    await update.message.reply_text(f"⏱️ Profiling for {seconds}s...")
+    # Run beside the update queue, otherwise the capture would only see this handler waiting.
+    context.application.create_task(send_profile_report(context.bot, update.effective_chat.id, seconds))
+
+def tracker_pid():
+    # In bot-only processes the tracker runs elsewhere and records its pid in the snapshot.
+    # A stale snapshot's pid may already belong to an unrelated process, which SIGUSR1 would kill.
+    if snapshot_reader is None:
+        return None
+    pid = fresh_snapshot().get('pid')
+    return pid if pid and pid != os.getpid() else None
+
+async def tracker_profile_report(pid, seconds):
+    try:
+        report_path = request_profile(pid, seconds)
+    except OSError as e:
+        return f"Could not signal tracker pid {pid}: {e}\n"
+    return await wait_for_report(report_path, seconds) or f"Tracker pid {pid} sent no report.\n"
+
+async def send_profile_report(bot, chat_id, seconds):
+    pid = tracker_pid()
+    captures = [capture_profile(seconds)]
+    if pid:
+        captures.append(tracker_profile_report(pid, seconds))
+    reports = await asyncio.gather(*captures)
+    if reports[0] is None:
+        await bot.send_message(chat_id=chat_id, text="⚠️ A capture is already running.")
+        return
+    stamp = datetime.now(app_timezone).strftime('%Y%m%d-%H%M%S')
+    for role, report in zip(["bot" if pid else "profile", "tracker"], reports):
+        buffer = BytesIO(report.encode("utf-8"))
+        buffer.name = f"{role}-{stamp}.txt"
+        await bot.send_document(chat_id=chat_id, document=buffer)
+
+class LazyBot:
+    # The tracker only needs Telegram to send alarms, so telegram is imported and the bot
+    # initialised (getMe) when the first alarm goes out, not before the first poll.
+    def __init__(self):
+        self._bot = None
+
+    async def _get(self):
+        if self._bot is None:
+            from telegram import Bot
+            bot = Bot(BOT_TOKEN)
+            await bot.initialize()
+            self._bot = bot
+        return self._bot
+
+    async def send_photo(self, **kwargs):
+        return await (await self._get()).send_photo(**kwargs)
+
+    async def shutdown(self):
+        if self._bot is not None:
+            await self._bot.shutdown()
+
+class TrackerApp:
+    def __init__(self):
+        self.bot = LazyBot()
+
+async def start_bot_only(app):
+    install_signal_handler()
+
+async def flush_on_shutdown(app):
+    flush_state()
+
+def warm_start():
+    # Restore caches before anything heavy is loaded; the tracker loop then takes its first
+    # poll before telegram is imported. Only the tracker's process writes the state journal.
+    started = time.perf_counter()
+    enable_journal()
+    restore_warm_state()
+    return started
+
+async def stop_tracker(tracker_app):
+    save_warm_state()
+    flush_state()
+    await tracker_app.bot.shutdown()
+
+def stop_on_signals(callback):
+    # SIGTERM is what systemd, docker and the split parent send on shutdown.
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, callback)
+
+async def run_tracker(started):
+    tracker_app = TrackerApp()
+    tracker = asyncio.create_task(background_player_tracker(tracker_app, started))
+    install_signal_handler()
+    stop_on_signals(tracker.cancel)
+    try:
+        await tracker
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await stop_tracker(tracker_app)
+
+def tracker_main():
+    global snapshot_writer
+    snapshot_writer = SnapshotWriter()
+    print('[ROLE]:', 'tracker, publishing to', snapshot_writer.path)
+    asyncio.run(run_tracker(warm_start()))
+
+def build_bot_app(post_init=None):
+    from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandler, MessageHandler, filters
+    app_builder = ApplicationBuilder().token(BOT_TOKEN).post_shutdown(flush_on_shutdown)
+    if post_init is not None:
+        app_builder = app_builder.post_init(post_init)
+    app = app_builder.build()
     app.add_handler(CommandHandler("start", greet))
+    app.add_handler(CommandHandler("profile", profile_command))
     app.add_handler(CommandHandler("status", check_status))
     app.add_handler(CommandHandler("en", en_command))
     app.add_handler(CommandHandler("ru", ru_command))
     app.add_handler(CallbackQueryHandler(handle_alarm_selection, pattern=r"^/alarm-set-\d+$"))
     app.add_handler(CallbackQueryHandler(handle_stats_selection, pattern=r"^(today|yesterday|weekly|monthly)-stats$"))
+    app.add_handler(CallbackQueryHandler(handle_trend_selection, pattern=r"^(wow|mom)-trends$"))
+    app.add_handler(CallbackQueryHandler(handle_page_selection, pattern=r"^page:"))
     app.add_handler(CallbackQueryHandler(handle_language_button))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_status_button))
     # app.add_handler(CallbackQueryHandler(handle_stats_selection, pattern=r"^(today|yesterday|weekly|monthly)-stats$"))
     print('[BOT_TOKEN]:', BOT_TOKEN)
-    app.run_polling()
+    return app
+
+def bot_main():
+    build_bot_app(start_bot_only).run_polling()
+
+async def run_all(started):
+    # The tracker task gets the loop first, so its first poll runs before telegram is
+    # imported and the bot talks to the API.
+    tracker_app = TrackerApp()
+    tracker = asyncio.create_task(background_player_tracker(tracker_app, started))
+    await asyncio.sleep(0)
+    install_signal_handler()
+    stop = asyncio.Event()
+    stop_on_signals(stop.set)
+    app = build_bot_app()
+    try:
+        async with app:
+            await app.start()
+            await app.updater.start_polling()
+            await stop.wait()
+            await app.updater.stop()
+            await app.stop()
+    finally:
+        tracker.cancel()
+        await stop_tracker(tracker_app)
+
+def recover_all():
+    recover_state_files(json_files=(USER_FILE, SERVER_TIME_FILE), jsonl_folders=(STATS_FOLDER,))
+
+def start_tracker_process():
+    # Spawned, not forked: a fork from the running bot would inherit its snapshot reader,
+    # its SQLite connection and any lock another thread happens to hold.
+    tracker = multiprocessing.get_context("spawn").Process(target=tracker_main, name="tracker", daemon=True)
+    tracker.start()
+    return tracker
+
+def supervise_tracker(tracker):
+    while True:
+        tracker.join()
+        print('[ROLE]:', f'tracker exited with code {tracker.exitcode}, restarting in {TRACKER_RESTART_DELAY}s')
+        time.sleep(TRACKER_RESTART_DELAY)
+        recover_all()
+        tracker = start_tracker_process()
+
+def main():
+    global snapshot_reader
+    parser = argparse.ArgumentParser(description="Game server tracker bot.")
+    parser.add_argument(
+        "--role", choices=["all", "tracker", "bot", "split"], default="all",
+        help="all: one process (default); tracker: poll + persist + alarms; "
+             "bot: Telegram handlers reading the tracker snapshot; split: tracker process + bot process. "
+             "Only one process per token may run the bot (all, bot or split): Telegram rejects a second "
+             "poller, and page handles and stats rollups live in that process's memory"
+    )
+    args = parser.parse_args()
+
+    if args.role != "tracker":
+        # Held until this process exits.
+        bot_lock = try_lock_file(BOT_LOCK_FILE)
+        if bot_lock is None:
+            print('[ROLE]:', 'another bot process is already polling this token, exiting')
+            raise SystemExit(1)
+    if args.role != "bot":
+        recover_all()
+    if args.role == "tracker":
+        tracker_main()
+        return
+    if args.role == "split":
+        threading.Thread(target=supervise_tracker, args=(start_tracker_process(),), daemon=True).start()
+    if args.role in ("bot", "split"):
+        snapshot_reader = SnapshotReader()
+        bot_main()
+    else:
+        asyncio.run(run_all(warm_start()))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
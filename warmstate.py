@@ -0,0 +1,40 @@
+import os, json, time
+from backends import get_storage
+from rollups import get_rollups
+from storage import atomic_write_json
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+WARM_STATE_FILE = os.path.join(SCRIPT_DIR, "warm_state.json")
+# Older snapshots are still validated piece by piece, this only skips obviously stale ones.
+MAX_WARM_STATE_AGE = 6 * 3600
+
+
+def save_warm_state(path=WARM_STATE_FILE, include_day=True):
+    rollups = get_rollups()
+    atomic_write_json(path, {
+        'saved_at': time.time(),
+        'storage': get_storage().export_warm_state(include_day),
+        'rollups': {'days': rollups.days, 'first_seen': rollups.first_seen} if rollups._loaded else None,
+    })
+
+
+def restore_warm_state(path=WARM_STATE_FILE):
+    if not os.path.exists(path):
+        return False
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except Exception as e:
+        print('[WARM START]:', 'ignoring unreadable state', e)
+        return False
+    if time.time() - state.get('saved_at', 0) > MAX_WARM_STATE_AGE:
+        print('[WARM START]:', 'state too old, starting cold')
+        return False
+    get_storage().restore_warm_state(state.get('storage') or {})
+    if state.get('rollups'):
+        rollups = get_rollups()
+        rollups.days = state['rollups']['days']
+        rollups.first_seen = state['rollups']['first_seen']
+        rollups._loaded = True
+    print('[WARM START]:', 'restored state saved', int(time.time() - state['saved_at']), 'seconds ago')
+    return True